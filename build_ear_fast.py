@@ -0,0 +1,14 @@
+"""
+Build the optional Cython EAR kernel (ear_fast) in place.
+
+Usage:
+    python build_ear_fast.py build_ext --inplace
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="ear_fast",
+    ext_modules=cythonize("ear_fast.pyx"),
+)
@@ -0,0 +1,93 @@
+"""
+Background camera capture for drowsiness detection.
+"""
+
+import cv2
+import numpy as np
+from threading import Thread, Condition
+from typing import Optional, Tuple
+
+
+class FrameGrabber:
+    """Continuously reads a VideoCapture on its own thread and keeps the newest frame."""
+
+    def __init__(self, cap: cv2.VideoCapture):
+        self.cap = cap
+        self.running = False
+        self.thread = None
+
+        # Newest frame and its sequence number, guarded by the condition
+        self._cond = Condition()
+        self._frame = None
+        self._seq = 0
+        self._last_read = 0
+
+        # The capture may only be released once the grab thread has left cap.read()
+        self._loop_exited = True
+        self._release_on_exit = False
+
+    def start(self) -> "FrameGrabber":
+        """Start the capture thread."""
+        self.running = True
+        self._loop_exited = False
+        self.thread = Thread(target=self._grab_loop)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def _grab_loop(self) -> None:
+        """Read frames as fast as the camera delivers them."""
+        try:
+            while self.running:
+                ret, frame = self.cap.read()
+                with self._cond:
+                    if not ret:
+                        self.running = False
+                    else:
+                        self._frame = frame
+                        self._seq += 1
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self.running = False
+                self._loop_exited = True
+                self._cond.notify_all()
+                if self._release_on_exit:
+                    self.cap.release()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Get the newest frame not returned before, waiting for one if needed.
+
+        Returns:
+            Tuple of (success, frame) like VideoCapture.read; success is
+            False once the grabber has stopped or the camera failed
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != self._last_read or not self.running)
+            if self._seq == self._last_read:
+                return False, None
+            self._last_read = self._seq
+            return True, self._frame
+
+    def stop(self) -> None:
+        """Stop the capture thread and wait for it to finish."""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def release(self) -> None:
+        """
+        Release the VideoCapture once the grab thread no longer uses it.
+
+        If the thread is still blocked in cap.read() (e.g. on an unplugged
+        camera), the release is deferred to the thread itself when the read
+        returns, so the capture is never freed while in use.
+        """
+        with self._cond:
+            if self._loop_exited:
+                self.cap.release()
+            else:
+                self._release_on_exit = True
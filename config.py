@@ -9,10 +9,22 @@ class Config:
     # Number of consecutive frames below threshold to trigger alert
     EAR_CONSEC_FRAMES = 20
     
+    # Number of recent frames averaged to smooth the EAR value
+    EAR_SMOOTHING_FRAMES = 10
+    
     # Frame dimensions for processing (smaller = faster)
     FRAME_WIDTH = 640
     FRAME_HEIGHT = 480
     
+    # Scale factor applied to frames before face detection (smaller = faster)
+    DETECTION_SCALE = 0.5
+    
+    # Run face detection every N frames and track the last face in between
+    DETECTION_INTERVAL = 5
+    
+    # Minimum correlation between a tracked box and the detected face before re-detecting
+    TRACKING_MIN_SIMILARITY = 0.5
+    
     # Facial landmark predictor model path
     PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
     
@@ -31,4 +43,12 @@ class Config:
     
     # Camera settings
     CAMERA_INDEX = 0
-    FPS = 30
\ No newline at end of file
+    FPS = 30
+    
+    # Request raw YUYV frames so grayscale is a cheap luma extraction
+    CAPTURE_YUYV = True
+    
+    # OpenCV settings: offload color conversion and resizing to OpenCL when a
+    # device is available, and cap OpenCV's CPU threads to leave room for dlib
+    USE_OPENCL = True
+    OPENCV_THREADS = 2
\ No newline at end of file
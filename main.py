@@ -9,25 +9,78 @@ and triggers audio alerts to prevent accidents due to driver fatigue.
 
 import cv2
 import dlib
+import math
 import numpy as np
 import time
-from threading import Thread
+import queue
+from threading import Thread, Event
 import logging
-from typing import Optional
+from typing import Optional, Tuple, Union
 
+from capture import FrameGrabber
 from config import Config
 from utils import (
-    setup_logging, eye_aspect_ratio, draw_eye_landmarks, 
+    setup_logging, draw_eye_landmarks, 
     draw_status_text, check_model_file, create_alarm_sound,
-    get_face_landmarks_indices
+    get_face_landmarks_indices, shape_to_np, split_frame,
+    render_text_overlay, paste_text_overlay, landmarks_bbox, to_numpy,
+    load_wav, face_patch, patch_similarity
 )
+from utils_numba import compute_ear_and_update, new_ear_state
 
 try:
-    from playsound import playsound
+    import sounddevice as sd
     SOUND_AVAILABLE = True
-except ImportError:
+except (ImportError, OSError):
     SOUND_AVAILABLE = False
-    print("Warning: playsound not available. Audio alerts disabled.")
+    print("Warning: sounddevice not available. Audio alerts disabled.")
+
+
+class FaceTrack:
+    """Follows one detected face between detector runs using its landmarks."""
+    
+    def __init__(self, face, bbox: Tuple[int, int, int, int], gray: np.ndarray):
+        # Detector box geometry, kept so the predictor is always given a box
+        # shaped like the ones it was trained on
+        self.width = face.right() - face.left()
+        self.height = face.bottom() - face.top()
+        self.dx = (face.left() + face.right()) / 2 - (bbox[0] + bbox[2]) / 2
+        self.dy = (face.top() + face.bottom()) / 2 - (bbox[1] + bbox[3]) / 2
+        self.bbox = bbox
+        
+        # Appearance of the detected face, used to notice when the tracked box
+        # no longer contains it
+        self.template = face_patch(gray, (face.left(), face.top(), face.right(), face.bottom()))
+    
+    def rect(self):
+        """
+        Get a detector-shaped box that follows the last landmarks.
+        
+        Returns:
+            dlib rectangle to run the landmark predictor in
+        """
+        cx = (self.bbox[0] + self.bbox[2]) / 2 + self.dx
+        cy = (self.bbox[1] + self.bbox[3]) / 2 + self.dy
+        half_w = self.width / 2
+        half_h = self.height / 2
+        return dlib.rectangle(int(cx - half_w), int(cy - half_h), int(cx + half_w), int(cy + half_h))
+    
+    def matches(self, gray: np.ndarray, face, min_similarity: float) -> bool:
+        """
+        Check that a box still shows the face that was detected.
+        
+        Args:
+            gray: Full resolution grayscale frame
+            face: dlib rectangle about to be passed to the predictor
+            min_similarity: Minimum normalized correlation with the detected face
+            
+        Returns:
+            True if the box still looks like the detected face
+        """
+        patch = face_patch(gray, (face.left(), face.top(), face.right(), face.bottom()))
+        if patch is None or self.template is None:
+            return False
+        return patch_similarity(patch, self.template) >= min_similarity
 
 
 class DrowsinessDetector:
@@ -37,17 +90,49 @@ class DrowsinessDetector:
         self.logger = setup_logging(Config.LOG_LEVEL, Config.LOG_FILE)
         self.frame_counter = 0
         self.alarm_on = False
-        self.ear_values = []
+        self.alarm_samples = None
+        self.alarm_rate = 0
+        
+        # Ring buffer of recent EAR values with a running sum
+        self.ear_buf = np.zeros(Config.EAR_SMOOTHING_FRAMES, dtype=np.float64)
+        self.ear_state = new_ear_state()
+        
+        # OpenCV runtime settings
+        self.use_opencl = Config.USE_OPENCL and cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self.use_opencl)
+        cv2.setNumThreads(Config.OPENCV_THREADS)
         
         # Initialize face detector and landmark predictor
         self.detector = dlib.get_frontal_face_detector()
         self.predictor = None
         
+        # Faces followed from their landmarks between detector runs
+        self.tracks = []
+        self.detect_tick = 0
+        
         # Eye landmark indices
         self.left_eye_indices, self.right_eye_indices = get_face_landmarks_indices()
         
+        # The right (36-41) and left (42-47) eyes are adjacent in the 68-point
+        # model, so both can be taken as one contiguous slice of the landmarks
+        self.eye_slice = slice(int(self.right_eye_indices[0]), int(self.left_eye_indices[-1]) + 1)
+        
+        # Reusable landmark buffers (one per face) for the 68-point model, stored
+        # as rows of x and y coordinates so each eye's coordinates are contiguous
+        self._lm_bufs = [np.empty((2, 68), dtype=np.int32)]
+        
+        # Static overlay text is rendered once and pasted every frame
+        self.threshold_overlay = render_text_overlay(f"Threshold: {Config.EAR_THRESHOLD}")
+        
         # Camera capture
         self.cap = None
+        self.grabber = None
+        self.frame_size = (Config.FRAME_WIDTH, Config.FRAME_HEIGHT)
+        self.set_text_anchors()
+        
+        # Hand-off between the detection thread and the display loop
+        self.frame_queue = queue.Queue(maxsize=1)
+        self.stop_event = Event()
         
         self.logger.info("Drowsiness Detection System initialized")
     
@@ -63,6 +148,21 @@ class DrowsinessDetector:
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.FRAME_WIDTH)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.FRAME_HEIGHT)
             self.cap.set(cv2.CAP_PROP_FPS, Config.FPS)
+            if Config.CAPTURE_YUYV:
+                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('Y', 'U', 'Y', '2'))
+                
+                # Only take raw frames if the camera really switched to YUYV;
+                # other native formats (MJPG, NV12, ...) must be decoded to BGR
+                fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+                if fourcc in (cv2.VideoWriter_fourcc('Y', 'U', 'Y', '2'),
+                              cv2.VideoWriter_fourcc('Y', 'U', 'Y', 'V')):
+                    self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+                else:
+                    self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+                    self.logger.info("Camera does not support YUYV capture, using BGR frames")
+            self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                               int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            self.set_text_anchors()
             
             self.logger.info("Camera initialized successfully")
             return True
@@ -70,6 +170,12 @@ class DrowsinessDetector:
             self.logger.error(f"Error initializing camera: {e}")
             return False
     
+    def set_text_anchors(self) -> None:
+        """Precompute the bottom-left text positions for the current frame size."""
+        height = self.frame_size[1]
+        self.ear_anchor = (10, height - 20)
+        self.thresh_anchor = (10, height - 50)
+    
     def initialize_predictor(self) -> bool:
         """Initialize facial landmark predictor."""
         try:
@@ -83,35 +189,114 @@ class DrowsinessDetector:
             self.logger.error(f"Error initializing predictor: {e}")
             return False
     
-    def play_alarm(self) -> None:
-        """Play alarm sound in a separate thread."""
+    def initialize_alarm(self) -> bool:
+        """Load the alarm sound once so alerts play from a cached buffer."""
         if not SOUND_AVAILABLE or not Config.ALARM_ENABLED:
+            return False
+        
+        try:
+            self.alarm_samples, self.alarm_rate = load_wav(Config.ALARM_SOUND)
+            self.logger.info("Alarm sound loaded")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Could not load alarm sound: {e}")
+            return False
+    
+    def play_alarm(self) -> None:
+        """Play the cached alarm sound without blocking."""
+        if self.alarm_samples is None or self.alarm_on:
             return
         
-        def alarm_thread():
-            try:
-                playsound(Config.ALARM_SOUND)
-            except Exception as e:
-                self.logger.warning(f"Could not play alarm sound: {e}")
+        self.alarm_on = True
+        try:
+            sd.play(self.alarm_samples, self.alarm_rate)
+        except Exception as e:
+            self.logger.warning(f"Could not play alarm sound: {e}")
+    
+    def detect_faces(self, gray: Union[np.ndarray, cv2.UMat]) -> list:
+        """
+        Detect faces on a downscaled copy of the frame.
         
-        if not self.alarm_on:
-            self.alarm_on = True
-            thread = Thread(target=alarm_thread)
-            thread.daemon = True
-            thread.start()
+        Args:
+            gray: Full resolution grayscale frame, as an array or UMat
+            
+        Returns:
+            Face rectangles in full resolution coordinates
+        """
+        scale = Config.DETECTION_SCALE
+        if scale == 1.0:
+            return list(self.detector(to_numpy(gray), 0))
+        
+        small = to_numpy(cv2.resize(gray, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+        return [
+            dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                           int(face.right() / scale), int(face.bottom() / scale))
+            for face in self.detector(small, 0)
+        ]
+    
+    def predict_landmarks(self, gray: np.ndarray, faces: list) -> list:
+        """
+        Run the landmark predictor for each face rectangle.
+        
+        Args:
+            gray: Full resolution grayscale frame
+            faces: Face rectangles to predict landmarks in
+            
+        Returns:
+            List of (2, 68) landmark arrays, one per face
+        """
+        while len(self._lm_bufs) < len(faces):
+            self._lm_bufs.append(np.empty((2, 68), dtype=np.int32))
+        return [shape_to_np(self.predictor(gray, face), buf)
+                for face, buf in zip(faces, self._lm_bufs)]
+    
+    def locate_landmarks(self, gray_src: Union[np.ndarray, cv2.UMat]) -> list:
+        """
+        Find facial landmarks, tracking the previous faces instead of detecting when possible.
+        
+        Between detector runs the predictor is given a detector-shaped box
+        centred on the previous landmarks. The detector runs when there is
+        nothing to track, when the image inside a tracked box no longer
+        correlates with the detected face (Config.TRACKING_MIN_SIMILARITY),
+        and in any case every Config.DETECTION_INTERVAL frames. The
+        appearance threshold is a heuristic; the interval is what bounds how
+        long a lost face can go unnoticed.
+        
+        Args:
+            gray_src: Full resolution grayscale frame, as an array or UMat
+            
+        Returns:
+            List of (2, 68) landmark arrays, one per face
+        """
+        gray = to_numpy(gray_src)
+        if self.tracks and self.detect_tick % Config.DETECTION_INTERVAL:
+            self.detect_tick += 1
+            faces = [track.rect() for track in self.tracks]
+            if all(track.matches(gray, face, Config.TRACKING_MIN_SIMILARITY)
+                   for track, face in zip(self.tracks, faces)):
+                landmarks = self.predict_landmarks(gray, faces)
+                for track, lm in zip(self.tracks, landmarks):
+                    track.bbox = landmarks_bbox(lm)
+                return landmarks
+        
+        self.detect_tick = 1
+        faces = self.detect_faces(gray_src)
+        landmarks = self.predict_landmarks(gray, faces)
+        self.tracks = [FaceTrack(face, landmarks_bbox(lm), gray) for face, lm in zip(faces, landmarks)]
+        return landmarks
     
     def process_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
         """
         Process a single frame for drowsiness detection.
         
         Args:
-            frame: Input frame from camera
+            frame: Input frame from camera (BGR or raw YUYV)
             
         Returns:
-            Processed frame with annotations
+            Processed BGR frame with annotations
         """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.detector(gray, 0)
+        frame, gray = split_frame(frame, self.frame_size, self.use_opencl)
+        faces = self.locate_landmarks(gray)
         
         if len(faces) == 0:
             draw_status_text(frame, "No face detected", (10, 30), (0, 0, 255))
@@ -119,61 +304,75 @@ class DrowsinessDetector:
             self.alarm_on = False
             return frame
         
-        for face in faces:
-            # Get facial landmarks
-            landmarks = self.predictor(gray, face)
-            landmarks_np = np.array([[p.x, p.y] for p in landmarks.parts()])
-            
-            # Extract eye coordinates
-            left_eye = landmarks_np[self.left_eye_indices]
-            right_eye = landmarks_np[self.right_eye_indices]
-            
-            # Calculate EAR for both eyes
-            left_ear = eye_aspect_ratio(left_eye)
-            right_ear = eye_aspect_ratio(right_eye)
-            ear = (left_ear + right_ear) / 2.0
+        for landmarks_np in faces:
+            # Extract eye coordinates as a (2, 2, 6) view of (x/y, eye, point)
+            eyes = landmarks_np[:, self.eye_slice].reshape(2, 2, 6)
+            right_eye, left_eye = eyes.transpose(1, 2, 0)
             
-            # Store EAR values for averaging
-            self.ear_values.append(ear)
-            if len(self.ear_values) > 10:
-                self.ear_values.pop(0)
-            
-            avg_ear = np.mean(self.ear_values)
+            # Calculate EAR for both eyes and update the smoothed average
+            avg_ear = compute_ear_and_update(eyes, self.ear_buf, self.ear_state)
+            if math.isnan(avg_ear):
+                # Degenerate landmarks before any valid EAR; nothing to judge yet
+                continue
             
             # Draw eye landmarks if enabled
             if Config.SHOW_LANDMARKS:
                 draw_eye_landmarks(frame, left_eye, (0, 255, 0))
                 draw_eye_landmarks(frame, right_eye, (0, 255, 0))
             
-            # Check for drowsiness
-            if avg_ear < Config.EAR_THRESHOLD:
-                self.frame_counter += 1
+            # Check for drowsiness: the counter increments while the eyes are
+            # closed and resets to zero as soon as they open
+            closed = int(avg_ear < Config.EAR_THRESHOLD)
+            self.frame_counter = (self.frame_counter + closed) * closed
+            
+            if self.frame_counter >= Config.EAR_CONSEC_FRAMES:
+                # Drowsiness detected
+                draw_status_text(frame, "DROWSINESS ALERT!", (10, 30), (0, 0, 255))
+                draw_status_text(frame, "Wake up!", (10, 70), (0, 0, 255))
                 
-                if self.frame_counter >= Config.EAR_CONSEC_FRAMES:
-                    # Drowsiness detected
-                    draw_status_text(frame, "DROWSINESS ALERT!", (10, 30), (0, 0, 255))
-                    draw_status_text(frame, "Wake up!", (10, 70), (0, 0, 255))
-                    
-                    # Play alarm
-                    self.play_alarm()
-                    
-                    self.logger.warning(f"Drowsiness detected! EAR: {avg_ear:.3f}")
-                else:
-                    draw_status_text(frame, f"Eyes closed: {self.frame_counter}/{Config.EAR_CONSEC_FRAMES}", 
-                                   (10, 30), (0, 255, 255))
+                # Play alarm
+                self.play_alarm()
+                
+                self.logger.warning(f"Drowsiness detected! EAR: {avg_ear:.3f}")
+            elif closed:
+                draw_status_text(frame, f"Eyes closed: {self.frame_counter}/{Config.EAR_CONSEC_FRAMES}", 
+                               (10, 30), (0, 255, 255))
             else:
-                self.frame_counter = 0
                 self.alarm_on = False
                 draw_status_text(frame, "Driver Alert", (10, 30), (0, 255, 0))
             
             # Display EAR values if enabled
             if Config.SHOW_EAR_VALUES:
-                draw_status_text(frame, f"EAR: {avg_ear:.3f}", (10, frame.shape[0] - 20), (255, 255, 255))
-                draw_status_text(frame, f"Threshold: {Config.EAR_THRESHOLD}", 
-                               (10, frame.shape[0] - 50), (255, 255, 255))
+                draw_status_text(frame, f"EAR: {avg_ear:.3f}", self.ear_anchor, (255, 255, 255))
+                paste_text_overlay(frame, self.threshold_overlay, self.thresh_anchor)
         
         return frame
     
+    def detection_loop(self) -> None:
+        """Capture and process frames until stopped, publishing the latest result."""
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.grabber.read()
+                if not ret:
+                    if not self.stop_event.is_set():
+                        self.logger.error("Failed to read frame from camera")
+                    break
+                
+                processed_frame = self.process_frame(frame)
+                if processed_frame is None:
+                    continue
+                
+                # Keep only the newest frame, dropping one the display has not shown yet
+                try:
+                    self.frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.frame_queue.put_nowait(processed_frame)
+        except Exception as e:
+            self.logger.error(f"Unexpected error in detection thread: {e}")
+        finally:
+            self.stop_event.set()
+    
     def run(self) -> None:
         """Main execution loop."""
         self.logger.info("Starting drowsiness detection system...")
@@ -187,6 +386,7 @@ class DrowsinessDetector:
         
         # Create alarm sound file if needed
         create_alarm_sound()
+        self.initialize_alarm()
         
         print("\n" + "="*50)
         print("DRIVER DROWSINESS DETECTION SYSTEM")
@@ -198,26 +398,31 @@ class DrowsinessDetector:
         print("- Press 's' to save current frame")
         print("="*50 + "\n")
         
+        # Frames are read continuously in the background so detection never
+        # waits on the camera for a full frame period
+        self.grabber = FrameGrabber(self.cap).start()
+        
+        # Capture and detection run on a worker thread; display and keys stay here
+        worker = Thread(target=self.detection_loop)
+        worker.daemon = True
+        worker.start()
+        processed_frame = None
+        
         try:
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.logger.error("Failed to read frame from camera")
-                    break
-                
-                # Process frame
-                processed_frame = self.process_frame(frame)
-                
-                if processed_frame is not None:
+            while not self.stop_event.is_set():
+                try:
+                    processed_frame = self.frame_queue.get(timeout=0.05)
                     # Display the frame
                     cv2.imshow(Config.WINDOW_NAME, processed_frame)
+                except queue.Empty:
+                    pass
                 
                 # Handle key presses
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                     self.logger.info("Quit command received")
                     break
-                elif key == ord('s'):
+                elif key == ord('s') and processed_frame is not None:
                     # Save current frame
                     timestamp = int(time.time())
                     filename = f"drowsiness_frame_{timestamp}.jpg"
@@ -230,11 +435,17 @@ class DrowsinessDetector:
         except Exception as e:
             self.logger.error(f"Unexpected error: {e}")
         finally:
+            self.stop_event.set()
+            worker.join(timeout=1.0)
             self.cleanup()
     
     def cleanup(self) -> None:
         """Clean up resources."""
-        if self.cap:
+        if self.grabber:
+            # The grabber releases the capture once its thread has stopped using it
+            self.grabber.stop()
+            self.grabber.release()
+        elif self.cap:
             self.cap.release()
         cv2.destroyAllWindows()
         self.logger.info("System shutdown complete")
@@ -2,49 +2,186 @@
 Utility functions for drowsiness detection.
 """
 
+import atexit
 import cv2
 import numpy as np
-from scipy.spatial import distance as dist
 import logging
+import math
 import os
-from typing import Tuple, List
+import queue
+import wave
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple, Union
+
+# Font settings shared by all status text
+TEXT_FONT = cv2.FONT_HERSHEY_SIMPLEX
+TEXT_SCALE = 0.7
+TEXT_THICKNESS = 2
 
 
 def setup_logging(log_level: str = "INFO", log_file: str = "app.log") -> logging.Logger:
-    """Set up logging configuration."""
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    """
+    Set up logging configuration.
+    
+    Records are put on a queue and written to the log file and console by a
+    background listener, so logging never blocks the frame loop on disk I/O.
+    If the root logger is already configured it is left untouched.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return logging.getLogger(__name__)
+    
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # The listener's handlers do the real formatting; only merge args here
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    root.setLevel(getattr(logging, log_level.upper()))
+    root.addHandler(queue_handler)
     return logging.getLogger(__name__)
 
 
-def eye_aspect_ratio(eye_points: np.ndarray) -> float:
+def eye_aspect_ratios(eyes: np.ndarray) -> np.ndarray:
+    """
+    Calculate the eye aspect ratio (EAR) for several eyes at once.
+    
+    Args:
+        eyes: Array of shape (2, N, 6) holding the x and y coordinates
+            of the landmarks of N eyes
+        
+    Returns:
+        Array of N eye aspect ratio values
+    """
+    # Vertical distances (p2-p6, p3-p5) and the horizontal distance (p1-p4)
+    # computed in a single vectorized pass over all eyes
+    d = eyes[:, :, [1, 2, 0]] - eyes[:, :, [5, 4, 3]]
+    s = np.sqrt(d[0] * d[0] + d[1] * d[1])
+    return (s[:, 0] + s[:, 1]) / (2.0 * s[:, 2])
+
+
+def shape_to_np(shape, out: np.ndarray) -> np.ndarray:
+    """
+    Copy dlib facial landmarks into a preallocated array.
+    
+    Args:
+        shape: dlib full_object_detection returned by the shape predictor
+        out: Preallocated (2, num_parts) integer array to fill with the
+            x coordinates in row 0 and the y coordinates in row 1
+        
+    Returns:
+        The filled output array
+    """
+    parts = shape.parts()
+    out[0] = [p.x for p in parts]
+    out[1] = [p.y for p in parts]
+    return out
+
+
+def split_frame(frame: np.ndarray, frame_size: Tuple[int, int],
+                use_opencl: bool = False) -> Tuple[np.ndarray, Union[np.ndarray, cv2.UMat]]:
+    """
+    Get BGR and grayscale views of a captured frame.
+    
+    Args:
+        frame: BGR frame, or raw YUYV data when RGB conversion is disabled
+        frame_size: (width, height) of the capture
+        use_opencl: Convert BGR frames on the OpenCL device and return the
+            grayscale image as a UMat
+        
+    Returns:
+        Tuple of (bgr_frame, gray_frame)
+        
+    Raises:
+        ValueError: If a raw frame is not YUYV data of the given size
+    """
+    if frame.ndim == 3 and frame.shape[2] == 3:
+        if use_opencl:
+            return frame, cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2GRAY)
+        return frame, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    
+    # Raw YUYV: the Y plane is the grayscale image, no weighted sum needed
+    width, height = frame_size
+    if frame.size != width * height * 2:
+        raise ValueError(f"Expected a {width}x{height} YUYV frame ({width * height * 2} bytes), "
+                         f"got {frame.size} bytes; disable Config.CAPTURE_YUYV for this camera")
+    yuyv = frame.reshape(height, width, 2)
+    return cv2.cvtColor(yuyv, cv2.COLOR_YUV2BGR_YUY2), cv2.cvtColor(yuyv, cv2.COLOR_YUV2GRAY_YUY2)
+
+
+def to_numpy(image: Union[np.ndarray, cv2.UMat]) -> np.ndarray:
+    """
+    Download an image from the OpenCL device if needed.
+    
+    Args:
+        image: NumPy array or UMat
+        
+    Returns:
+        The image as a NumPy array
+    """
+    return image.get() if isinstance(image, cv2.UMat) else image
+
+
+def landmarks_bbox(landmarks: np.ndarray) -> Tuple[int, int, int, int]:
     """
-    Calculate the eye aspect ratio (EAR) given eye landmark points.
+    Get the bounding box of a set of landmarks.
     
     Args:
-        eye_points: Array of 6 (x, y) coordinates for eye landmarks
+        landmarks: (2, N) array of x and y coordinates
         
     Returns:
-        Eye aspect ratio value
+        (left, top, right, bottom) tuple
+    """
+    xs, ys = landmarks
+    return int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())
+
+
+def face_patch(gray: np.ndarray, box: Tuple[int, int, int, int], size: int = 32) -> Optional[np.ndarray]:
     """
-    # Compute the euclidean distances between the two sets of
-    # vertical eye landmarks (x, y)-coordinates
-    A = dist.euclidean(eye_points[1], eye_points[5])
-    B = dist.euclidean(eye_points[2], eye_points[4])
+    Get a small fixed-size grayscale patch of a face box for appearance checks.
     
-    # Compute the euclidean distance between the horizontal
-    # eye landmark (x, y)-coordinates
-    C = dist.euclidean(eye_points[0], eye_points[3])
+    Args:
+        gray: Full resolution grayscale frame
+        box: (left, top, right, bottom) of the face, clipped to the frame
+        size: Side length of the returned patch
+        
+    Returns:
+        float32 (size, size) patch, or None if the box lies outside the frame
+    """
+    height, width = gray.shape[:2]
+    left, top = max(box[0], 0), max(box[1], 0)
+    right, bottom = min(box[2], width), min(box[3], height)
+    if right - left < 2 or bottom - top < 2:
+        return None
+    return cv2.resize(gray[top:bottom, left:right], (size, size),
+                      interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def patch_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Normalized cross-correlation of two equally sized patches.
     
-    # Compute the eye aspect ratio
-    ear = (A + B) / (2.0 * C)
-    return ear
+    Args:
+        a: First patch
+        b: Second patch
+        
+    Returns:
+        Correlation between -1 and 1, or 0 if either patch is flat
+    """
+    # OpenCV reports a perfect match for a flat template, so handle that here
+    if a.std() < 1e-3 or b.std() < 1e-3:
+        return 0.0
+    score = float(cv2.matchTemplate(a, b, cv2.TM_CCOEFF_NORMED)[0, 0])
+    return score if math.isfinite(score) else 0.0
 
 
 def draw_eye_landmarks(frame: np.ndarray, eye_points: np.ndarray, color: Tuple[int, int, int] = (0, 255, 0)) -> None:
@@ -56,8 +193,9 @@ def draw_eye_landmarks(frame: np.ndarray, eye_points: np.ndarray, color: Tuple[i
         eye_points: Array of eye landmark points
         color: BGR color tuple for drawing
     """
-    hull = cv2.convexHull(eye_points)
-    cv2.drawContours(frame, [hull], -1, color, 1)
+    # Eye landmarks of the 68-point model are already in polygon order,
+    # so the outline can be drawn directly without a convex hull
+    cv2.polylines(frame, [eye_points.astype(np.int32).reshape(-1, 1, 2)], True, color, 1)
 
 
 def draw_status_text(frame: np.ndarray, text: str, position: Tuple[int, int], 
@@ -71,7 +209,47 @@ def draw_status_text(frame: np.ndarray, text: str, position: Tuple[int, int],
         position: (x, y) position for text
         color: BGR color tuple for text
     """
-    cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    cv2.putText(frame, text, position, TEXT_FONT, TEXT_SCALE, color, TEXT_THICKNESS)
+
+
+def render_text_overlay(text: str, color: Tuple[int, int, int] = (255, 255, 255)) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Pre-render static status text so it can be pasted without rasterizing the font.
+    
+    Args:
+        text: Text to render
+        color: BGR color tuple for text
+        
+    Returns:
+        Tuple of (patch, mask, ascent) where ascent is the distance from the
+        top of the patch to the text baseline
+    """
+    (width, height), baseline = cv2.getTextSize(text, TEXT_FONT, TEXT_SCALE, TEXT_THICKNESS)
+    pad = TEXT_THICKNESS
+    ascent = height + pad
+    patch = np.zeros((ascent + baseline + pad, width + 2 * pad, 3), dtype=np.uint8)
+    cv2.putText(patch, text, (pad, ascent), TEXT_FONT, TEXT_SCALE, color, TEXT_THICKNESS)
+    return patch, patch.any(axis=2), ascent
+
+
+def paste_text_overlay(frame: np.ndarray, overlay: Tuple[np.ndarray, np.ndarray, int],
+                       position: Tuple[int, int]) -> None:
+    """
+    Paste text pre-rendered by render_text_overlay onto the frame.
+    
+    Args:
+        frame: Input image frame
+        overlay: Tuple returned by render_text_overlay
+        position: (x, y) baseline position, as for draw_status_text
+    """
+    patch, mask, ascent = overlay
+    x = position[0] - TEXT_THICKNESS
+    y = position[1] - ascent
+    h, w = mask.shape
+    if x < 0 or y < 0 or y + h > frame.shape[0] or x + w > frame.shape[1]:
+        return
+    roi = frame[y:y + h, x:x + w]
+    roi[mask] = patch[mask]
 
 
 def check_model_file(model_path: str) -> bool:
@@ -105,18 +283,49 @@ def create_alarm_sound() -> None:
             f.write("# Replace this with an actual .wav file for audio alerts\n")
 
 
-def get_face_landmarks_indices() -> Tuple[List[int], List[int]]:
+def load_wav(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Decode a PCM WAV file into a float32 sample buffer.
+    
+    Args:
+        path: Path to the WAV file
+        
+    Returns:
+        Tuple of (samples, sample_rate) where samples has shape (frames, channels)
+        
+    Raises:
+        ValueError: If the file uses an unsupported sample width
+    """
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    return samples.reshape(-1, channels), rate
+
+
+def get_face_landmarks_indices() -> Tuple[np.ndarray, np.ndarray]:
     """
     Get the facial landmark indices for left and right eyes.
     
     Returns:
-        Tuple of (left_eye_indices, right_eye_indices)
+        Tuple of (left_eye_indices, right_eye_indices) as index arrays,
+        ready for fancy indexing without per-call list conversion
     """
     # Facial landmark indices for eyes based on 68-point model
     left_eye_start, left_eye_end = 42, 48
     right_eye_start, right_eye_end = 36, 42
     
-    left_eye_indices = list(range(left_eye_start, left_eye_end))
-    right_eye_indices = list(range(right_eye_start, right_eye_end))
+    left_eye_indices = np.arange(left_eye_start, left_eye_end, dtype=np.intp)
+    right_eye_indices = np.arange(right_eye_start, right_eye_end, dtype=np.intp)
     
     return left_eye_indices, right_eye_indices
\ No newline at end of file
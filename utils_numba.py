@@ -0,0 +1,105 @@
+"""
+Compiled hot-path helpers for drowsiness detection.
+
+The EAR kernel prefers the ahead-of-time compiled Cython module (ear_fast)
+when it has been built, then Numba when it is installed, and falls back to
+the NumPy implementation from utils otherwise.
+"""
+
+import math
+import numpy as np
+
+from utils import eye_aspect_ratios
+
+try:
+    import ear_fast
+    CYTHON_AVAILABLE = True
+except ImportError:
+    CYTHON_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def new_ear_state() -> np.ndarray:
+    """
+    Create the state array used by compute_ear_and_update.
+
+    Returns:
+        Array of [next index, fill count, running sum]
+    """
+    return np.zeros(3, dtype=np.float64)
+
+
+def _update_ring(ear, ring, state):
+    """
+    Push an EAR value into the ring buffer and return the running average.
+
+    Non-finite values (e.g. from coincident eye corners) are dropped so they
+    cannot poison the running sum; the previous average is returned instead,
+    or NaN if there is no history yet.
+    """
+    if not math.isfinite(ear):
+        return state[2] / state[1] if state[1] > 0.0 else math.nan
+
+    size = ring.shape[0]
+    idx = int(state[0])
+    state[2] += ear - ring[idx]
+    ring[idx] = ear
+    state[0] = (idx + 1) % size
+    state[1] = min(state[1] + 1.0, size)
+    return state[2] / state[1]
+
+
+if CYTHON_AVAILABLE:
+    _mean_ear = ear_fast.mean_ear
+elif NUMBA_AVAILABLE:
+    # error_model='numpy' makes a zero corner distance yield inf/nan like the
+    # other backends instead of raising ZeroDivisionError; fastmath is left off
+    # because it lets the compiler assume results are finite
+    @njit(cache=True, error_model='numpy')
+    def _mean_ear(eyes):
+        total = 0.0
+        for e in range(eyes.shape[1]):
+            xs = eyes[0, e]
+            ys = eyes[1, e]
+            a = math.hypot(float(xs[1] - xs[5]), float(ys[1] - ys[5]))
+            b = math.hypot(float(xs[2] - xs[4]), float(ys[2] - ys[4]))
+            c = math.hypot(float(xs[0] - xs[3]), float(ys[0] - ys[3]))
+            total += (a + b) / (2.0 * c)
+        return total / eyes.shape[1]
+else:
+    def _mean_ear(eyes):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(eye_aspect_ratios(eyes).mean())
+
+if NUMBA_AVAILABLE:
+    _update_ring = njit(cache=True)(_update_ring)
+
+
+def compute_ear_and_update(eyes, ring, state):
+    """
+    Compute the mean EAR of all eyes and push it into the smoothing ring buffer.
+
+    Args:
+        eyes: Array of shape (2, N, 6) holding the x and y coordinates
+            of the landmarks of N eyes
+        ring: Ring buffer of recent EAR values, updated in place
+        state: Array from new_ear_state, updated in place
+
+    Returns:
+        Average EAR over the ring buffer, or NaN if no valid EAR has been
+        seen yet. Every backend returns a non-finite EAR for degenerate
+        landmarks (coincident eye corners); _update_ring drops it and the
+        previous average is carried forward.
+    """
+    return _update_ring(_mean_ear(eyes), ring, state)
+
+
+# With Numba alone the whole update compiles to a single native call; a
+# Cython kernel cannot be called from nopython code, so it is used from Python
+if NUMBA_AVAILABLE and not CYTHON_AVAILABLE:
+    compute_ear_and_update = njit(cache=True)(compute_ear_and_update)